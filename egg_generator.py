@@ -1,13 +1,11 @@
+import csv
+import math
+import struct
+
 import numpy as np
 import matplotlib.pyplot as plt
 import streamlit as st
-from stl import mesh
 import io
-import stl
-import tempfile
-import os
-from scipy import integrate
-import pandas as pd
 
 st.set_page_config(
         layout="wide",
@@ -27,50 +25,95 @@ button[title="View fullscreen"]{
 st.markdown(hide_img_fs, unsafe_allow_html=True)
 ######################################################
 
+# Binary STL layout: 80-byte header, uint32 triangle count, then one
+# 50-byte record per triangle
+_STL_TRIANGLE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("attr", "<u2"),
+])
+
+@st.cache_data(show_spinner=False)
 def load_bird_species():
-    df = pd.read_csv("bird_species.csv")
-    bird_species = df.set_index("species").T.to_dict()
+    with open("bird_species.csv", newline="") as f:
+        bird_species = {
+            row["species"]: {key: float(value) for key, value in row.items() if key != "species"}
+            for row in csv.DictReader(f)
+        }
     return bird_species
 
 def egg_equation(x, B, L, D_L4, n):
-    a = L / 2
     b = B / 2
     k = (D_L4 / L) - 0.5  # Adjusts the "pointiness" of the egg
     c = n / 10  # Affects the overall shape
-    y = b * np.sqrt(1 - (x / a)**2) * (1 + c * (x / a) + k * (x / a)**2)
+    u = x * (2.0 / L)  # x / a
+    u2 = u * u
+    # Horner form of 1 + c*u + k*u^2, updating buffers in place so the
+    # 2-D mesh case doesn't allocate a temporary per operation
+    poly = u * k
+    poly += c
+    poly *= u
+    poly += 1.0
+    np.subtract(1.0, u2, out=u2)
+    # float32 rounding in u can push u2 a hair above 1 at the domain
+    # endpoints; clamp so the sqrt can't go NaN
+    np.maximum(u2, 0.0, out=u2)
+    np.sqrt(u2, out=u2)
+    y = b * u2 * poly
     return y
 
 def calculate_egg_volume(B, L, D_L4, n):
-    # Calculate volume using numerical integration
+    # The volume integrand pi * y^2 is a polynomial in u = x/a, so the
+    # integral over [-1, 1] has a closed form: expand
+    # (1 - u^2) * (1 + c*u + k*u^2)^2 and integrate term by term
+    # (odd powers vanish, int u^2m du = 2/(2m+1))
     a = L / 2
+    b = B / 2
+    k = (D_L4 / L) - 0.5
+    c = n / 10
+    c2k = c * c + 2 * k
+    volume = math.pi * b * b * a * 2 * (1 + (c2k - 1) / 3 + (k * k - c2k) / 5 - k * k / 7)
+    return volume
 
-    def integrand(x):
-        y = egg_equation(x, B, L, D_L4, n)
-        return np.pi * y**2
+@st.cache_resource(show_spinner=False)
+def _preview_figure():
+    # One reusable figure per process; generate_2d_preview only swaps
+    # the plotted data instead of rebuilding hundreds of Matplotlib
+    # objects on every rerun
+    fig, ax = plt.subplots(figsize=(10, 5))
+    top, = ax.plot([], [], '#BE1E2D')
+    bottom, = ax.plot([], [], '#BE1E2D')
 
-    volume, _ = integrate.quad(integrand, -a, a)
-    return volume
+    ax.set_title("2D Egg Preview")
+    ax.set_aspect('equal', 'box')
+    ax.grid(True)
+
+    # Set the axis labels with units
+    ax.set_xlabel("mm")
+    ax.set_ylabel("mm")
 
+    return fig, ax, top, bottom
+
+@st.cache_data(max_entries=32, show_spinner=False)
 def generate_2d_preview(B, L, D_L4, n,auto_scale):
-    x = np.linspace(-L/2, L/2, 1000)
+    x = np.linspace(-L/2, L/2, 200, dtype=np.float32)
     y = egg_equation(x, B, L, D_L4, n)
-    
+
     # Calculate the scaling factor
     max_width = np.max(y) * 2
     scale_factor = B / max_width
-    
+
     y_scaled = y * scale_factor
-    
-    fig, ax = plt.subplots(figsize=(10, 5))
-    ax.plot(x, y_scaled, '#BE1E2D')
-    ax.plot(x, -y_scaled, '#BE1E2D')
-    
-    # Fill the egg shape with a lighter shade
+
+    fig, ax, top, bottom = _preview_figure()
+    top.set_data(x, y_scaled)
+    bottom.set_data(x, -y_scaled)
+
+    # Fill the egg shape with a lighter shade; fill_between always
+    # builds a fresh PolyCollection, so drop the previous one first
+    for collection in list(ax.collections):
+        collection.remove()
     ax.fill_between(x, y_scaled, -y_scaled, color='#FFA07A', alpha=0.5)
-    
-    ax.set_title("2D Egg Preview")
-    ax.set_aspect('equal', 'box')
-    ax.grid(True)
 
     if auto_scale:
         margin = 0.1  # 10% margin
@@ -82,54 +125,74 @@ def generate_2d_preview(B, L, D_L4, n,auto_scale):
         ax.set_xlim(-80, 80)
         ax.set_ylim(-70, 70)
 
-    # Set the axis labels with units
-    ax.set_xlabel("mm")
-    ax.set_ylabel("mm")
-
     return fig
 
+@st.cache_data(max_entries=32, show_spinner=False)
 def generate_3d_model(B, L, D_L4, n):
     # Generate non-linear spacing for x
     num_l_points = int((L * 1.16) +50 )
     num_w_points = int((B *1.16) +50)
 
-    t = np.linspace(0, np.pi, num_w_points)
+    t = np.linspace(0, np.pi, num_w_points, dtype=np.float32)
     x = (L/2) * np.cos(t)
-    
-    theta = np.linspace(0, 2*np.pi, num_l_points)
-    X, Theta = np.meshgrid(x, theta)
-    
-    R = egg_equation(X, B, L, D_L4, n)
-    
+
+    theta = np.linspace(0, 2*np.pi, num_l_points, dtype=np.float32)
+    # Broadcast a row of x against a column of theta instead of
+    # materializing full meshgrid arrays
+    x_row = x[None, :]
+    R = egg_equation(x_row, B, L, D_L4, n)
+
     # Calculate the scaling factor
     max_width = np.max(R) * 2
     scale_factor = B / max_width
-    
+
     R_scaled = R * scale_factor
+
+    # cos/sin only vary along theta, so evaluate them once per ring
+    # and let the multiply broadcast across x
+    cos_theta = np.cos(theta)[:, None]
+    sin_theta = np.sin(theta)[:, None]
+    Y = R_scaled * cos_theta
+    Z = R_scaled * sin_theta
+    X = np.broadcast_to(x_row, Y.shape)
+
+    vertices = np.ascontiguousarray(np.stack([X, Y, Z], axis=-1).reshape(-1, 3), dtype=np.float32)
+
+    # Build both triangles of every quad at once with broadcasting
+    n_theta, n_x = Y.shape
+    i = np.arange(n_theta - 1)[:, None]
+    j = np.arange(n_x - 1)[None, :]
+    v0 = i * n_x + j
+    v1 = v0 + 1
+    v2 = v0 + n_x
+    v3 = v2 + 1
+    tri1 = np.stack([v0, v1, v2], axis=-1)
+    tri2 = np.stack([v1, v3, v2], axis=-1)
+    faces = np.stack([tri1, tri2], axis=-2).reshape(-1, 3).astype(np.int32, copy=False)
     
-    Y = R_scaled * np.cos(Theta)
-    Z = R_scaled * np.sin(Theta)
-    
-    vertices = np.column_stack([X.flatten(), Y.flatten(), Z.flatten()])
-    
-    faces = []
-    n_theta, n_x = Theta.shape
-    for i in range(n_theta - 1):
-        for j in range(n_x - 1):
-            v0 = i * n_x + j
-            v1 = v0 + 1
-            v2 = (i + 1) * n_x + j
-            v3 = v2 + 1
-            faces.extend([[v0, v1, v2], [v1, v3, v2]])
-    
-    egg_mesh = mesh.Mesh(np.zeros(len(faces), dtype=mesh.Mesh.dtype))
-    for i, f in enumerate(faces):
-        for j in range(3):
-            egg_mesh.vectors[i][j] = vertices[f[j],:]
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".stl") as temp:
-        egg_mesh.save(temp.name, mode=stl.Mode.BINARY)
-        return temp.name
+    # Write the binary STL directly from the indexed representation:
+    # expanding vertices[faces] into a full mesh.Mesh only to serialize
+    # it would keep a second triplicated copy of every vertex in RAM
+    v = vertices[faces]
+    normals = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+    # Normalize in one shot; the rows touching the poles produce
+    # zero-area triangles, so leave their normals at zero rather than
+    # dividing by zero
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    np.divide(normals, lengths, out=normals, where=lengths > 0)
+
+    # np.empty skips zeroing a buffer we fill field by field anyway;
+    # only attr needs an explicit clear since nothing else writes it
+    triangles = np.empty(len(faces), dtype=_STL_TRIANGLE)
+    triangles["normal"] = normals
+    triangles["vertices"] = v
+    triangles["attr"] = 0
+
+    buf = io.BytesIO()
+    buf.write(b"SaviMade Egg Generator binary STL".ljust(80, b"\0"))
+    buf.write(struct.pack("<I", len(triangles)))
+    buf.write(triangles.tobytes())
+    return buf.getvalue()
 
 def main():
     # Load the bird egg data from the JSON file
@@ -183,8 +246,10 @@ def main():
         st.markdown("---")   
         st.markdown("<p style='text-align: center;'>If you determine the parameters for a species of bird's egg, let me know and I'll add it to the program!</p>", unsafe_allow_html=True)
 
-    with cola.container(border=True):
-        
+    # A form batches all the parameter widgets into a single rerun on
+    # submit instead of one rerun per slider drag or keystroke
+    with cola.form("params"):
+
         col1, col2 = st.columns([7, 1],vertical_alignment="center")
         col1.markdown("<h2>Parameters</h2>", unsafe_allow_html=True)
         L = col1.slider("Length (mm)", 10.0, 160.0, st.session_state.L, 0.1)
@@ -206,6 +271,8 @@ def main():
         if n_text:
             n = float(n_text)
 
+        st.form_submit_button("Apply", type="primary")
+
     # Calculate egg volume
     volume = calculate_egg_volume(B, L, D_L4, n)/1000
 
@@ -226,30 +293,25 @@ def main():
 
     col1, col2 = colb.columns(2)  # Create two columns with equal width
     
-    stl_data = None  # Define stl_data variable outside of the if block
-    file_name = "SaviMadeEgg.stl"  # Define default file name
-    
     if cola.button("Generate 3D Model",type="primary"):
-        with st.spinner("Generating 3D model..."):
-            stl_file = generate_3d_model(B, L, D_L4, n)
-            
-            # Read the binary STL data from the temporary file
-            with open(stl_file, "rb") as f:
-                stl_data = f.read()
-            
-            # Delete the temporary file
-            os.remove(stl_file)
-            
-            cola.success("3D model generated successfully!")
-    
-    if stl_data is not None:
+        # Keep the mesh in session_state keyed by its parameters so the
+        # reruns triggered by filename keystrokes neither lose nor
+        # regenerate it
+        params = (B, L, D_L4, n)
+        if st.session_state.get("stl_params") != params:
+            with st.spinner("Generating 3D model..."):
+                st.session_state.stl_data = generate_3d_model(B, L, D_L4, n)
+                st.session_state.stl_params = params
+        cola.success("3D model generated successfully!")
+
+    if st.session_state.get("stl_data") is not None:
         # Prompt the user for a file name
         file_name = cola.text_input("Enter a file name", value="SaviMadeEgg(Parameters-_" + str(L_text) + "_" + str(B_text) + "_" + str(D_L4_text) + "_" + str(n_text) +")") + ".stl"
 
         # Save the STL file with the user-specified file name
         cola.download_button(
             label="Download STL",
-            data=stl_data,
+            data=st.session_state.stl_data,
             file_name=file_name,
             mime="application/octet-stream",
             type="primary"